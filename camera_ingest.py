@@ -15,6 +15,14 @@ NAME = os.getenv("NAME", "RobotCamera-MediaPlayer")
 
 print("DEBUG token_len:", len(VIDEOSDK_TOKEN or ""), "meeting:", MEETING_ID)
 
+# Prefer uvloop's libuv-based loop when installed (POSIX only)
+try:
+    import uvloop
+
+    uvloop.install()
+except ImportError:
+    pass
+
 # Same pattern as official docs
 loop = asyncio.get_event_loop()
 
@@ -2,8 +2,11 @@ import os
 import asyncio
 import time
 import fractions
+import gc
+import threading
 
 import cv2
+import numpy as np
 from av import VideoFrame
 from dotenv import load_dotenv
 from vsaiortc.mediastreams import MediaStreamError
@@ -27,18 +30,38 @@ NAME = os.getenv("NAME", "RobotCamera-OpenCV")
 
 print("DEBUG token_len:", len(VIDEOSDK_TOKEN or ""), "meeting:", MEETING_ID)
 
+# Prefer uvloop's libuv-based loop when installed (POSIX only)
+try:
+    import uvloop
+
+    uvloop.install()
+except ImportError:
+    pass
+
 # Use a persistent asyncio loop, like in the VideoSDK docs
 loop = asyncio.get_event_loop()
 
 # ------------ PIPELINE CONFIG ------------
 
 # Target FPS and resolution for the stream
+# (keep TARGET_WIDTH a multiple of 8 so the bgr24 plane needs no padding)
 TARGET_FPS = 30
 TARGET_WIDTH = 1280
 TARGET_HEIGHT = 720
 
 VIDEO_CLOCK_RATE = 90000  # standard RTP clock rate
 VIDEO_TIME_BASE = fractions.Fraction(1, VIDEO_CLOCK_RATE)
+PTIME_TS = VIDEO_CLOCK_RATE // TARGET_FPS  # RTP ticks per frame
+PTIME_NS = 1_000_000_000 // TARGET_FPS  # wall-clock ns per frame
+
+# Run resize/overlays on a UMat (OpenCL, frame stays on the device)
+# only when an OpenCL device exists; otherwise UMat just adds a copy
+USE_OPENCL = cv2.ocl.haveOpenCL()
+cv2.ocl.setUseOpenCL(USE_OPENCL)
+
+# Young-generation GC threshold while streaming (CPython default is 700),
+# so short-lived per-frame objects don't keep triggering collections
+GC_GEN0_THRESHOLD = 50_000
 
 
 def process_frame(frame_bgr):
@@ -55,13 +78,29 @@ def process_frame(frame_bgr):
       - overlay HUD / detections
       - compress or downscale resolution, etc.
     """
-    # 1) Resize to 720p (or whatever your pipeline wants)
-    frame_resized = cv2.resize(frame_bgr, (TARGET_WIDTH, TARGET_HEIGHT))
-
-    # 2) (Optional) Add any debug overlays here
+    # 1) Resize to 720p (or whatever your pipeline wants), skipped when the
+    #    camera already delivers the target size.
+    #    Resize before any color conversion so it runs on fewer pixels.
+    #    INTER_AREA for downscales, INTER_LINEAR (vectorized) otherwise.
+    h, w = frame_bgr.shape[:2]
+    if w != TARGET_WIDTH or h != TARGET_HEIGHT:
+        interp = cv2.INTER_AREA if w > TARGET_WIDTH else cv2.INTER_LINEAR
+        src = cv2.UMat(frame_bgr) if USE_OPENCL else frame_bgr
+        frame_resized = cv2.resize(
+            src, (TARGET_WIDTH, TARGET_HEIGHT), interpolation=interp
+        )
+    else:
+        frame_resized = frame_bgr
+
+    # 2) (Optional) Add any debug overlays here, on frame_resized as-is
+    #    (it may still be a UMat) so the frame isn't re-streamed per pass
     # cv2.putText(frame_resized, "RobotCamera", (20, 40),
     #             cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0, 255, 0), 2)
 
+    # Download from the device only once, at the VideoFrame boundary
+    if isinstance(frame_resized, cv2.UMat):
+        frame_resized = frame_resized.get()
+
     return frame_resized
 
 
@@ -80,32 +119,111 @@ class OpenCVCameraTrack(CustomVideoTrack):
         if not self.cap.isOpened():
             raise RuntimeError(f"Failed to open camera device {device_index}")
 
-        # Try to set resolution (best effort, not guaranteed)
+        # Keep only the newest frame in the driver queue so read() never
+        # hands us a stale one (must be set before streaming starts)
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+        # Ask for MJPEG so the camera can deliver the target size at full
+        # FPS over USB2, then try to set resolution (best effort)
+        self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*"MJPG"))
         self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, TARGET_WIDTH)
         self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, TARGET_HEIGHT)
         self.cap.set(cv2.CAP_PROP_FPS, TARGET_FPS)
 
-        self._start = time.time()
+        self._start_ns = time.monotonic_ns()
         self._timestamp = None
+        self._behind = False  # set by next_timestamp() when frames were dropped
+
+        # Capture runs on its own thread so the blocking read() never
+        # stalls the asyncio loop; recv() only picks up the latest frame.
+        self._lock = threading.Lock()
+        self._frame_ready = threading.Event()
+        self._latest = None
+        self._running = True
+        self._grabber = threading.Thread(target=self._grab_loop, daemon=True)
+        self._grabber.start()
+
+        # One VideoFrame reused for every recv(); _vf_array is a numpy view
+        # onto its bgr24 plane so frames are copied straight into it.
+        # Safe because the sender encodes each frame before asking for the next.
+        self._vf = VideoFrame(TARGET_WIDTH, TARGET_HEIGHT, "bgr24")
+        plane = self._vf.planes[0]
+        self._vf_array = (
+            np.frombuffer(plane, np.uint8)
+            .reshape(TARGET_HEIGHT, plane.line_size)[:, : TARGET_WIDTH * 3]
+            .reshape(TARGET_HEIGHT, TARGET_WIDTH, 3)
+        )
+        self._vf_filled = False
 
         print(f"OpenCVCameraTrack initialized on device {device_index}")
 
+    def _grab_loop(self):
+        """
+        Camera thread: keep overwriting the single-frame slot with the newest
+        capture. A failed read (or stop()) ends the thread; on the way out it
+        clears _running and leaves the event set so waiters see it.
+        """
+        while self._running:
+            ret, frame = self.cap.read()
+            if not ret:
+                break
+            with self._lock:
+                self._latest = frame
+                self._frame_ready.set()
+
+        with self._lock:
+            self._running = False
+            self._frame_ready.set()
+
+    def _get_latest(self, timeout=None):
+        """
+        Block (off the event loop) until the grabber has a fresh frame,
+        then take it. With timeout=None this waits as long as the camera
+        takes, like a blocking read(). Returns None if the grabber has
+        stopped, or if a finite timeout expires first.
+        """
+        while True:
+            if not self._frame_ready.wait(timeout):
+                return None
+            with self._lock:
+                frame = self._latest
+                self._latest = None
+                if self._running:
+                    self._frame_ready.clear()
+                running = self._running
+            if frame is not None or not running:
+                return frame
+
+    def stop(self):
+        self._running = False
+        super().stop()
+
     async def next_timestamp(self):
         """
         Copy of the timestamp logic from VideoSDK's custom track example.
         Ensures frames are paced at ~TARGET_FPS with a valid RTP timestamp.
-        """
-        VIDEO_PTIME = 1 / TARGET_FPS  # packet time
+        Uses integer monotonic nanoseconds so the schedule never drifts.
 
+        If we are more than one frame behind (e.g. the pacer is congested),
+        the missed slots are skipped instead of being produced back to back.
+        """
         if self.readyState != "live":
             raise MediaStreamError("Track is not live")
 
         if self._timestamp is not None:
-            self._timestamp += int(VIDEO_PTIME * VIDEO_CLOCK_RATE)
-            wait = self._start + (self._timestamp / VIDEO_CLOCK_RATE) - time.time()
-            await asyncio.sleep(max(0, wait))
+            self._timestamp += PTIME_TS
+            target_ns = (
+                self._start_ns
+                + self._timestamp * 1_000_000_000 // VIDEO_CLOCK_RATE
+            )
+            wait_ns = target_ns - time.monotonic_ns()
+            self._behind = wait_ns < -PTIME_NS
+            if self._behind:
+                self._timestamp += PTIME_TS * (-wait_ns // PTIME_NS)
+            elif wait_ns > 0:
+                await asyncio.sleep(wait_ns / 1e9)
         else:
-            self._start = time.time()
+            self._start_ns = time.monotonic_ns()
             self._timestamp = 0
 
         return self._timestamp, VIDEO_TIME_BASE
@@ -116,15 +234,26 @@ class OpenCVCameraTrack(CustomVideoTrack):
         """
         pts, time_base = await self.next_timestamp()
 
-        ret, frame = self.cap.read()
-        if not ret:
+        if self._behind and self._vf_filled:
+            # Running late: don't wait for the camera. Take a fresh capture
+            # if one is already there, otherwise resend the last frame
+            # without processing it again.
+            frame = self._get_latest(timeout=0)
+        else:
+            frame = await loop.run_in_executor(None, self._get_latest)
+
+        if frame is None and not self._running:
             raise MediaStreamError("Failed to read frame from camera")
 
-        # FRAME PROCESSING LAYER
-        frame = process_frame(frame)
+        if frame is not None:
+            # FRAME PROCESSING LAYER
+            frame = process_frame(frame)
 
-        # Convert to VideoFrame for VideoSDK
-        vf = VideoFrame.from_ndarray(frame, format="bgr24")
+            # Blit into the pre-allocated VideoFrame for VideoSDK
+            np.copyto(self._vf_array, frame)
+            self._vf_filled = True
+
+        vf = self._vf
         vf.pts = pts
         vf.time_base = time_base
         return vf
@@ -182,6 +311,12 @@ def main():
     meeting.join()
     print("Joined successfully as", NAME)
 
+    # Everything long-lived exists now: freeze it out of the collector's
+    # view so gen-2 passes stay short, and collect young objects less often
+    gc.collect()
+    gc.freeze()
+    gc.set_threshold(GC_GEN0_THRESHOLD, *gc.get_threshold()[1:])
+
     print("Event loop running, streaming OpenCV frames. Ctrl+C to stop.")
     try:
         loop.run_forever()
@@ -1,9 +1,9 @@
 import asyncio
-import json
 import os
 import time
-from datetime import datetime
 import glob
+import queue
+import threading
 
 from dotenv import load_dotenv
 from videosdk import (
@@ -16,6 +16,8 @@ from videosdk import (
 
 import serial  # for Arduino serial
 
+from teleop_common import log, make_teleop_handler
+
 # ---------- ENV ----------
 load_dotenv()
 
@@ -25,41 +27,70 @@ NAME = "RobotTeleopNode"
 
 TELEOP_TOPIC = "TELEOP"
 
+# Prefer uvloop's libuv-based loop when installed (POSIX only)
+try:
+    import uvloop
+
+    uvloop.install()
+except ImportError:
+    pass
+
 # Global event loop
 loop = asyncio.get_event_loop()
 
 # ---------- ARDUINO SERIAL ----------
 arduino_ser = None  # will be set by init_arduino()
+ARDUINO_BAUD = 115200
+ARDUINO_TIMEOUT = 0.05  # read timeout once connected
+ARDUINO_PROBE_TIMEOUT = 0.2  # wait for a ping reply while probing
+
+# Commands waiting for the serial thread. Size 1, latest wins: if the
+# Arduino is slow, an unsent command is replaced by the newer one.
+arduino_q = queue.Queue(maxsize=1)
+
+# Wire format for each legal command, encoded once at import
+CMD_BYTES = {
+    "forward": b"forward\n",
+    "backward": b"backward\n",
+    "left": b"left\n",
+    "right": b"right\n",
+}
+VALID_CMDS = frozenset(CMD_BYTES)
 
 
 def find_arduino_port():
     """
     Try to auto-detect an Arduino-like serial port.
-    We scan /dev/ttyUSB* and /dev/ttyACM* and return the first that works.
+    We scan /dev/ttyUSB* and /dev/ttyACM* and return (port, serial) for the
+    first that works, keeping it open so init_arduino() can reuse it
+    without a second open + reset wait. Returns (None, None) if none work.
     """
     candidates = glob.glob("/dev/ttyUSB*") + glob.glob("/dev/ttyACM*")
 
     print(f"[ARDUINO] Scanning ports, candidates: {candidates}")
 
     for port in candidates:
+        s = None
         try:
             print(f"[ARDUINO] Probing {port} ...")
-            s = serial.Serial(port, 115200, timeout=0.05)
+            s = serial.Serial(port, ARDUINO_BAUD, timeout=ARDUINO_PROBE_TIMEOUT)
             time.sleep(2)  # let it reset
-            # ping it once
+
+            # ping it once; don't block forever, just see if it behaves
+            s.reset_input_buffer()
             s.write(b"ping\n")
-            time.sleep(0.1)
+            resp = s.read_until(b"\n", 64).decode(errors="ignore").strip()
 
-            # don't block forever; just see if it behaves
-            _ = s.read(10)
-            s.close()
-            print(f"[ARDUINO] {port} looks valid.")
-            return port
+            s.timeout = ARDUINO_TIMEOUT
+            print(f"[ARDUINO] {port} looks valid (reply: {resp!r}).")
+            return port, s
         except Exception as e:
             print(f"[ARDUINO] {port} failed: {e}")
+            if s is not None:
+                s.close()
 
     print("[ARDUINO] No valid Arduino port found.")
-    return None
+    return None, None
 
 
 def init_arduino():
@@ -68,22 +99,12 @@ def init_arduino():
     """
     global arduino_ser
 
-    port = find_arduino_port()
-    if port is None:
+    port, arduino_ser = find_arduino_port()
+    if arduino_ser is None:
         print("[ARDUINO] Could not find any port. Arduino will NOT be connected.")
-        arduino_ser = None
         return
 
-    BAUD_RATE = 115200
-
-    try:
-        print(f"[ARDUINO] Connecting on {port} @ {BAUD_RATE}...")
-        arduino_ser = serial.Serial(port, BAUD_RATE, timeout=0.05)
-        time.sleep(2)  # allow Arduino to reset
-        print("[ARDUINO] Connected.")
-    except Exception as e:
-        print(f"[ARDUINO] Failed to connect on {port}: {e}")
-        arduino_ser = None
+    print(f"[ARDUINO] Connected on {port} @ {ARDUINO_BAUD}.")
 
 
 def send_cmd_to_arduino(cmd: str):
@@ -92,71 +113,70 @@ def send_cmd_to_arduino(cmd: str):
     Arduino expects lines like 'forward\\n'.
     """
     global arduino_ser
-    now = datetime.now().isoformat(timespec="seconds")
 
     if arduino_ser is None:
-        print(f"[{now}] [ARDUINO] Not connected; cannot send cmd='{cmd}'")
+        log.warning("[ARDUINO] Not connected; cannot send cmd='%s'", cmd)
+        return
+
+    payload = CMD_BYTES.get(cmd)
+    if payload is None:
+        log.warning("[ARDUINO] Unknown cmd='%s'; not sending", cmd)
         return
 
     try:
-        msg = (cmd + "\n").encode("utf-8")
-        arduino_ser.write(msg)
-        print(f"[{now}] [ARDUINO] Sent: {cmd}")
+        arduino_ser.write(payload)
+        log.info("[ARDUINO] Sent: %s", cmd)
 
-        # Light, non-blocking-ish read if anything is waiting
-        if arduino_ser.in_waiting:
-            resp = arduino_ser.readline().decode(errors="ignore").strip()
+        # Non-blocking: grab whatever is already buffered in one read
+        n = arduino_ser.in_waiting
+        if n:
+            resp = arduino_ser.read(n).decode(errors="ignore").strip()
             if resp:
-                print(f"[{now}] [ARDUINO] Reply: {resp}")
+                log.info("[ARDUINO] Reply: %s", resp)
 
     except Exception as e:
-        print(f"[{now}] [ARDUINO] Error sending cmd='{cmd}': {e}")
+        log.error("[ARDUINO] Error sending cmd='%s': %s", cmd, e)
 
 
-# ---------- TELEOP HANDLER ----------
+def _serial_worker():
+    """
+    Serial thread: send queued commands so a slow serial write never blocks
+    the asyncio loop (PubSub callbacks, ICE keepalives).
+    """
+    while True:
+        send_cmd_to_arduino(arduino_q.get())
 
-def handle_teleop_message(pubsub_message):
+
+def queue_cmd_for_arduino(cmd: str):
     """
-    Callback for PubSub messages on TELEOP topic.
-    pubsub_message is a dict from the VideoSDK Python SDK.
-    Expected keys: "message", "senderId"
+    Hand a command to the serial thread, replacing any command it
+    hasn't picked up yet.
     """
     try:
-        # Handle both dict and object styles just in case
-        if isinstance(pubsub_message, dict):
-            payload_str = pubsub_message.get("message")
-            sender = pubsub_message.get("senderId")
-        else:
-            payload_str = getattr(pubsub_message, "message", None)
-            sender = getattr(pubsub_message, "senderId", None)
-
-        if not payload_str:
-            print("Got PubSub message with no 'message' field:", pubsub_message)
-            return
-
-        data = json.loads(payload_str)
-
-        cmd = data.get("cmd")
-        ts = data.get("ts")
-
-        now = datetime.now().isoformat(timespec="seconds")
-        print(
-            f"[{now}] TELEOP received: cmd={cmd} ts={ts} sender={sender}"
-        )
+        arduino_q.put_nowait(cmd)
+    except queue.Full:
+        try:
+            arduino_q.get_nowait()
+        except queue.Empty:
+            pass
+        arduino_q.put_nowait(cmd)
 
-        # Only forward known commands to Arduino
-        if cmd in ("forward", "backward", "left", "right"):
-            send_cmd_to_arduino(cmd)
-        else:
-            print(f"[{now}] TELEOP ignoring unknown cmd='{cmd}' (raw data={data})")
 
-    except Exception as e:
-        print(
-            "Error handling teleop message:",
-            e,
-            "raw=",
-            pubsub_message,
-        )
+# ---------- TELEOP HANDLER ----------
+
+def forward_teleop_cmd(cmd):
+    """
+    TELEOP sink: forward a drive command from the PubSub payload
+    ({"cmd": "forward", "ts": ...}) to the Arduino.
+    """
+    # Only forward known commands to Arduino
+    if cmd in VALID_CMDS:
+        queue_cmd_for_arduino(cmd)
+    else:
+        log.info("TELEOP ignoring unknown cmd='%s'", cmd)
+
+
+handle_teleop_message = make_teleop_handler(forward_teleop_cmd)
 
 
 class TeleopMeetingHandler(MeetingEventHandler):
@@ -207,6 +227,7 @@ def main():
 if __name__ == "__main__":
     # 1) Connect to Arduino
     init_arduino()
+    threading.Thread(target=_serial_worker, daemon=True).start()
 
     # 2) Join meeting + start Teleop listener
     main()
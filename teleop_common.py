@@ -0,0 +1,88 @@
+"""
+Shared TELEOP PubSub handling for the robot-side teleop nodes
+(teleop_bak.py, teleop_gzb.py, teleop_robot.py).
+
+Each node only supplies a "sink": the callable that acts on the
+command/key pulled out of a TELEOP message (Arduino, ROS2, ...).
+"""
+import logging
+
+try:
+    import orjson as json  # faster TELEOP payload parsing if installed
+except ImportError:
+    import json
+
+# ---------- LOGGING ----------
+# TELEOP path logs lazily; the formatter stamps the time
+log = logging.getLogger("teleop")
+log.setLevel(logging.INFO)
+_log_handler = logging.StreamHandler()
+_log_handler.setFormatter(
+    logging.Formatter("[%(asctime)s] %(message)s", datefmt="%Y-%m-%dT%H:%M:%S")
+)
+log.addHandler(_log_handler)
+
+
+def _dict_fields(pubsub_message):
+    return pubsub_message.get("message"), pubsub_message.get("senderId")
+
+
+def _attr_fields(pubsub_message):
+    return (
+        getattr(pubsub_message, "message", None),
+        getattr(pubsub_message, "senderId", None),
+    )
+
+
+def _message_fields(pubsub_message):
+    """
+    Return (payload_str, sender) for a PubSub message.
+
+    The SDK delivers either dicts or objects depending on its version, but
+    never both, so the first message picks the matching getter and rebinds
+    this name to it; later messages skip the type check.
+    """
+    global _message_fields
+    _message_fields = _dict_fields if isinstance(pubsub_message, dict) else _attr_fields
+    return _message_fields(pubsub_message)
+
+
+def parse_teleop(pubsub_message, field: str = "cmd"):
+    """
+    Pull (value, ts, sender) out of a TELEOP PubSub message, where value is
+    payload[field] ("cmd" for drive commands, "key" for joint jog keys).
+    Returns None if the message has no payload.
+    """
+    payload_str, sender = _message_fields(pubsub_message)
+
+    if not payload_str:
+        log.warning("Got PubSub message with no 'message' field: %s", pubsub_message)
+        return None
+
+    data = json.loads(payload_str)
+    value = data.get(field)
+    ts = data.get("ts")
+
+    log.info("TELEOP received: %s=%s ts=%s sender=%s", field, value, ts, sender)
+    return value, ts, sender
+
+
+def dispatch(parsed, sink):
+    """Hand the parsed value to sink; no-op if parse_teleop() returned None."""
+    if parsed is not None:
+        sink(parsed[0])
+
+
+def make_teleop_handler(sink, field: str = "cmd"):
+    """
+    Build the PubSub callback for the TELEOP topic that parses each message
+    and forwards payload[field] to sink.
+    """
+
+    def handle_teleop_message(pubsub_message):
+        try:
+            dispatch(parse_teleop(pubsub_message, field), sink)
+        except Exception:
+            log.exception("Error handling teleop message, raw=%s", pubsub_message)
+
+    return handle_teleop_message
@@ -1,9 +1,11 @@
 import asyncio
-import json
+import logging
 import os
 import math
-from datetime import datetime
+import queue
+import threading
 
+import numpy as np
 from dotenv import load_dotenv
 from videosdk import (
     VideoSDK,
@@ -16,9 +18,12 @@ from videosdk import (
 # ---------- ROS2 ----------
 import rclpy
 from rclpy.node import Node
+from rclpy.executors import SingleThreadedExecutor
 from trajectory_msgs.msg import JointTrajectory, JointTrajectoryPoint
 from builtin_interfaces.msg import Duration
 
+from teleop_common import log, make_teleop_handler
+
 # ---------- ENV ----------
 load_dotenv()
 
@@ -37,7 +42,9 @@ TRAJ_TOPIC = "/joint_trajectory_controller/joint_trajectory"
 JOINT_NAMES = ["joint1", "joint2", "joint3", "joint4", "joint5", "joint6", "joint7"]
 
 STEP_RAD = math.radians(3.0)  # 3 degrees per key press
+JOINT_LIMIT_RAD = math.pi  # targets are clamped to +/- this per joint
 TFS = 0.4  # time_from_start seconds
+CONTROL_HZ = 50.0  # max rate at which coalesced key presses are published
 
 KEYMAP = {
     "q": (0, +1), "a": (0, -1),
@@ -51,91 +58,123 @@ KEYMAP = {
 
 STOP_KEYS = {" ", "x"}
 
+# KEYMAP + STOP_KEYS in one table so handle_key does a single lookup;
+# joint index -1 means stop/hold
+STOP_ACTION = (-1, 0)
+DISPATCH = {**KEYMAP, **dict.fromkeys(STOP_KEYS, STOP_ACTION)}
+
 ros_node = None  # set in __main__
+ros_executor = None  # spins ros_node on its own thread, set in __main__
 
 
 class JointJogNode(Node):
     def __init__(self):
         super().__init__("videosdk_joint_jog")
         self.pub = self.create_publisher(JointTrajectory, TRAJ_TOPIC, 10)
-        self.q = [0.0] * len(JOINT_NAMES)
+        self.q = np.zeros(len(JOINT_NAMES), np.float64)
+        self._limits = np.full(len(JOINT_NAMES), JOINT_LIMIT_RAD)
+
+        # Message template reused by publish_target(); only the positions
+        # change between publishes (TFS is constant)
+        self._msg = JointTrajectory()
+        self._msg.joint_names = JOINT_NAMES
+        self._pt = JointTrajectoryPoint()
+        sec = int(TFS)
+        self._pt.time_from_start = Duration(sec=sec, nanosec=int((TFS - sec) * 1e9))
+        self._msg.points = [self._pt]
+
+        # Key presses accumulate here and are applied at most once per
+        # control period, so bursts become a single trajectory publish
+        self._pending = np.zeros(len(JOINT_NAMES), np.int64)
+        self._dirty = False
+        self.create_timer(1.0 / CONTROL_HZ, self._on_control_tick)
+
+        # Keys arrive from the asyncio thread; the guard condition wakes the
+        # executor thread right away to drain them, no polling needed
+        self._keys = queue.Queue()
+        self._keys_ready = self.create_guard_condition(self._drain_keys)
+
         self.get_logger().info(f"Publishing JointTrajectory to {TRAJ_TOPIC}")
 
     def publish_target(self):
-        msg = JointTrajectory()
-        msg.joint_names = JOINT_NAMES
-
-        pt = JointTrajectoryPoint()
-        pt.positions = self.q[:]
-        sec = int(TFS)
-        pt.time_from_start = Duration(sec=sec, nanosec=int((TFS - sec) * 1e9))
-        msg.points = [pt]
+        self._pt.positions = self.q.tolist()
+        self.pub.publish(self._msg)
+
+    def _flush(self):
+        """Apply accumulated key steps to the target and publish it."""
+        self.q += self._pending * STEP_RAD
+        np.clip(self.q, -self._limits, self._limits, out=self.q)
+        self._pending[:] = 0
+        self._dirty = False
+        self.publish_target()
 
-        self.pub.publish(msg)
+    def _on_control_tick(self):
+        if self._dirty:
+            self._flush()
+
+    def submit_key(self, key: str):
+        """Thread-safe entry point: queue a key for the ROS executor thread."""
+        self._keys.put_nowait(key)
+        self._keys_ready.trigger()
+
+    def _drain_keys(self):
+        while True:
+            try:
+                key = self._keys.get_nowait()
+            except queue.Empty:
+                return
+            # Runs on the executor thread: an exception escaping here would
+            # stop spin() for good, so log it and keep draining
+            try:
+                self.handle_key(key)
+            except Exception:
+                log.exception("Error handling teleop key=%r", key)
 
     def handle_key(self, key: str):
-        if not key:
+        if not isinstance(key, str):
+            log.warning("TELEOP ignoring non-string key=%r", key)
             return
-        k = key.lower().strip()
-
-        now = datetime.now().isoformat(timespec="seconds")
-
-        if k in STOP_KEYS:
-            print(f"[{now}] TELEOP stop/hold key='{k}' -> publishing current target")
-            self.publish_target()
+        if not key:
             return
-
-        if k not in KEYMAP:
+        # Keys normally arrive canonical ("q", " "); only normalize on a miss
+        k = key
+        action = DISPATCH.get(k)
+        if action is None:
+            k = key.lower().strip()
+            action = DISPATCH.get(k)
+            if action is None:
+                return
+
+        idx, sgn = action
+        if idx < 0:
+            log.info("TELEOP stop/hold key='%s' -> publishing current target", k)
+            self._flush()
             return
 
-        idx, sgn = KEYMAP[k]
-        self.q[idx] += sgn * STEP_RAD
-        print(f"[{now}] TELEOP key='{k}' -> joint{idx+1} target={self.q[idx]:+.4f} rad")
-        self.publish_target()
-
-
-async def ros_spin_task():
-    """Keep rclpy alive without blocking VideoSDK callbacks."""
-    global ros_node
-    while rclpy.ok():
-        if ros_node is not None:
-            rclpy.spin_once(ros_node, timeout_sec=0.0)
-        await asyncio.sleep(0.01)
+        self._pending[idx] += sgn
+        self._dirty = True
+        if log.isEnabledFor(logging.INFO):
+            target = np.clip(
+                self.q[idx] + self._pending[idx] * STEP_RAD,
+                -self._limits[idx],
+                self._limits[idx],
+            )
+            log.info("TELEOP key='%s' -> joint%d target=%+.4f rad", k, idx + 1, target)
 
 
-def handle_teleop_message(pubsub_message):
+def submit_teleop_key(key):
     """
-    PubSub callback. Expected payload from index.html:
+    TELEOP sink. Expected payload from index.html:
       {"key":"q","ts":123...}
     """
-    global ros_node
-    try:
-        if isinstance(pubsub_message, dict):
-            payload_str = pubsub_message.get("message")
-            sender = pubsub_message.get("senderId")
-        else:
-            payload_str = getattr(pubsub_message, "message", None)
-            sender = getattr(pubsub_message, "senderId", None)
-
-        if not payload_str:
-            print("Got PubSub message with no 'message' field:", pubsub_message)
-            return
-
-        data = json.loads(payload_str)
-        key = data.get("key")
-        ts = data.get("ts")
+    if ros_node is None:
+        log.warning("ROS node not ready yet; ignoring key='%s'", key)
+        return
 
-        now = datetime.now().isoformat(timespec="seconds")
-        print(f"[{now}] TELEOP received: key={key} ts={ts} sender={sender}")
-
-        if ros_node is None:
-            print(f"[{now}] WARN: ROS node not ready yet; ignoring key='{key}'")
-            return
+    ros_node.submit_key(key)
 
-        ros_node.handle_key(key)
 
-    except Exception as e:
-        print("Error handling teleop message:", e, "raw=", pubsub_message)
+handle_teleop_message = make_teleop_handler(submit_teleop_key, field="key")
 
 
 class TeleopMeetingHandler(MeetingEventHandler):
@@ -189,8 +228,10 @@ if __name__ == "__main__":
     rclpy.init()
     ros_node = JointJogNode()
 
-    # ✅ schedule ROS spinner on our explicit loop (fixes your runtime error)
-    loop.create_task(ros_spin_task())
+    # Spin ROS on its own thread so callbacks wake on events, not polling
+    ros_executor = SingleThreadedExecutor()
+    ros_executor.add_node(ros_node)
+    threading.Thread(target=ros_executor.spin, daemon=True).start()
 
     # Join meeting + start PubSub listener
     main()
@@ -201,6 +242,8 @@ if __name__ == "__main__":
     except KeyboardInterrupt:
         print("Shutting down Teleop loop...")
         loop.stop()
+        if ros_executor is not None:
+            ros_executor.shutdown()
         if ros_node is not None:
             ros_node.destroy_node()
         rclpy.shutdown()
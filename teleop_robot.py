@@ -1,7 +1,5 @@
 import asyncio
-import json
 import os
-from datetime import datetime
 
 from dotenv import load_dotenv
 from videosdk import (
@@ -12,6 +10,8 @@ from videosdk import (
     PubSubSubscribeConfig,
 )
 
+from teleop_common import make_teleop_handler
+
 # ---------- ENV ----------
 load_dotenv()
 
@@ -21,48 +21,27 @@ NAME = "RobotTeleopNode"
 
 TELEOP_TOPIC = "TELEOP"
 
+# Prefer uvloop's libuv-based loop when installed (POSIX only)
+try:
+    import uvloop
+
+    uvloop.install()
+except ImportError:
+    pass
+
 # Global event loop (same as in docs)
 loop = asyncio.get_event_loop()
 
 
-def handle_teleop_message(pubsub_message):
+def handle_teleop_cmd(cmd):
     """
-    Callback for PubSub messages on TELEOP topic.
-    pubsub_message is a dict from the VideoSDK Python SDK.
-    Expected keys: "message", "senderId"
+    TELEOP sink: called with payload["cmd"] for every TELEOP message.
     """
-    try:
-        # Handle both dict and object styles just in case
-        if isinstance(pubsub_message, dict):
-            payload_str = pubsub_message.get("message")
-            sender = pubsub_message.get("senderId")
-        else:
-            payload_str = getattr(pubsub_message, "message", None)
-            sender = getattr(pubsub_message, "senderId", None)
-
-        if not payload_str:
-            print("Got PubSub message with no 'message' field:", pubsub_message)
-            return
-
-        data = json.loads(payload_str)
-
-        cmd = data.get("cmd")
-        ts = data.get("ts")
-
-        now = datetime.now().isoformat(timespec="seconds")
-        print(
-            f"[{now}] TELEOP received: cmd={cmd} ts={ts} sender={sender}"
-        )
+    # TODO: actually send this to your robot here
 
-        # TODO: actually send this to your robot here
 
-    except Exception as e:
-        print(
-            "Error handling teleop message:",
-            e,
-            "raw=",
-            pubsub_message,
-        )
+handle_teleop_message = make_teleop_handler(handle_teleop_cmd)
+
 
 class TeleopMeetingHandler(MeetingEventHandler):
     def __init__(self, meeting: Meeting):
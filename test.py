@@ -12,8 +12,8 @@ ser.write(b"forward\n")
 
 time.sleep(0.5)
 
-while ser.in_waiting:
-    print("Arduino says:", ser.readline().decode(errors="ignore").strip())
+for line in ser.read_all().splitlines():
+    print("Arduino says:", line.decode(errors="ignore").strip())
 
 ser.close()
 print("Done.")